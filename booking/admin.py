@@ -86,3 +86,4 @@ class SeatAdmin(admin.ModelAdmin):
     )
     list_filter = ("status", "trip")
     search_fields = ("code", "customer_name", "customer_wa", "claim_code", "booking_code")
+    list_select_related = ("trip",)
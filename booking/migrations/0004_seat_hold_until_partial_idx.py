@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-14 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_trip_bus_image_trip_bus_image_cropping'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(condition=models.Q(('status', 'HOLD')), fields=['hold_until'], name='seat_hold_until_partial_idx'),
+        ),
+    ]
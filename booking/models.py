@@ -1,5 +1,7 @@
+import binascii
+import os
+
 from django.db import models
-import secrets
 from image_cropping import ImageRatioField
 
 
@@ -69,6 +71,12 @@ class Seat(models.Model):
             models.Index(fields=["status", "hold_until"]),
             models.Index(fields=["claim_code"]),
             models.Index(fields=["booking_code"]),  # ✅ optional, tapi bagus
+            # partial index: hanya seat HOLD -> kecil, dipakai sweep expire_holds
+            models.Index(
+                fields=["hold_until"],
+                name="seat_hold_until_partial_idx",
+                condition=models.Q(status="HOLD"),
+            ),
         ]
 
     def __str__(self):
@@ -76,11 +84,11 @@ class Seat(models.Model):
 
     @staticmethod
     def generate_claim_code() -> str:
-        raw = secrets.token_hex(4).upper()
-        return f"{raw[:4]}-{raw[4:]}"
+        # Contoh: 9A2F-3C1D
+        raw = binascii.hexlify(os.urandom(4)).decode("ascii").upper()
+        return raw[:4] + "-" + raw[4:]
 
     @staticmethod
     def generate_booking_code() -> str:
         # Contoh: BK-9A2F3C
-        raw = secrets.token_hex(3).upper()
-        return f"BK-{raw}"
+        return "BK-" + binascii.hexlify(os.urandom(3)).decode("ascii").upper()
@@ -2,16 +2,32 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import timedelta
-from typing import Iterable, Optional
+from typing import Iterator, Optional
 
 from django.db import models, transaction
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from django.utils import timezone
 
 from .models import Seat, Trip
 
 HOLD_MINUTES_DEFAULT = 10
 MAX_HOLD_PER_SESSION_DEFAULT = 4
+TRIPS_CHUNK_SIZE = 200
+
+# Kolom yang benar-benar dipakai payload seat map (public)
+SEAT_MAP_TRIP_FIELDS = (
+    "id",
+    "title",
+    "bus_type",
+    "route_from",
+    "route_to",
+    "depart_at",
+    "price",
+    "capacity_total",
+    "admin_wa",
+)
+# trip_id wajib ada: dipakai Prefetch untuk memasangkan seat ke trip
+SEAT_MAP_SEAT_FIELDS = ("id", "trip_id", "code", "status", "hold_until")
 
 
 @dataclass
@@ -50,13 +66,42 @@ def expire_holds() -> int:
 # -----------------------------
 # Queries
 # -----------------------------
-def list_trips() -> Iterable[Trip]:
-    return Trip.objects.filter(is_active=True).order_by("depart_at")
+def list_trips() -> Iterator[dict]:
+    """
+    Projection ringan untuk listing (tanpa instansiasi model).
+    bus_image berisi nama file (relatif terhadap MEDIA_URL) atau kosong.
+    Di-stream per chunk supaya hasil query tidak ditampung utuh di memori.
+    """
+    return (
+        Trip.objects.filter(is_active=True)
+        .order_by("depart_at")
+        .values(
+            "id",
+            "title",
+            "bus_type",
+            "route_from",
+            "route_to",
+            "depart_at",
+            "price",
+            "capacity_total",
+            "bus_image",
+        )
+        .iterator(chunk_size=TRIPS_CHUNK_SIZE)
+    )
 
 
 def get_trip_with_seats(trip_id: int) -> Optional[Trip]:
     try:
-        return Trip.objects.prefetch_related("seats").get(id=trip_id, is_active=True)
+        return (
+            Trip.objects.only(*SEAT_MAP_TRIP_FIELDS)
+            .prefetch_related(
+                Prefetch(
+                    "seats",
+                    queryset=Seat.objects.only(*SEAT_MAP_SEAT_FIELDS).order_by("code"),
+                )
+            )
+            .get(id=trip_id, is_active=True)
+        )
     except Trip.DoesNotExist:
         return None
 
@@ -71,7 +116,7 @@ def get_seat_map(trip_id: int) -> ServiceResult:
     if not trip:
         return ServiceResult(False, "Trip tidak ditemukan.")
 
-    seats = trip.seats.order_by("code").all()
+    seats = trip.seats.all()  # sudah di-prefetch (urut code, kolom terbatas)
     data = {
         "trip": {
             "id": trip.id,
@@ -131,11 +176,7 @@ def hold_seat(
         return ServiceResult(False, f"Maksimal hold {max_hold_per_session} kursi.")
 
     try:
-        seat = (
-            Seat.objects.select_for_update()
-            .select_related("trip")
-            .get(trip_id=trip_id, code=seat_code)
-        )
+        seat = Seat.objects.select_for_update(of=("self",)).get(trip_id=trip_id, code=seat_code)
     except Seat.DoesNotExist:
         return ServiceResult(False, "Kursi tidak ditemukan.")
 
@@ -177,7 +218,7 @@ def release_seat(trip_id: int, seat_code: str, hold_token: str) -> ServiceResult
     now = _now()
 
     try:
-        seat = Seat.objects.select_for_update().get(trip_id=trip_id, code=seat_code)
+        seat = Seat.objects.select_for_update(of=("self",)).get(trip_id=trip_id, code=seat_code)
     except Seat.DoesNotExist:
         return ServiceResult(False, "Kursi tidak ditemukan.")
 
@@ -224,7 +265,7 @@ def attach_contact_and_generate_claim(
         return ServiceResult(False, "Trip tidak ditemukan.")
 
     seats = (
-        Seat.objects.select_for_update()
+        Seat.objects.select_for_update(of=("self",))
         .filter(
             trip_id=trip_id,
             status=Seat.Status.HOLD,
@@ -283,7 +324,7 @@ def claim_hold_by_code(
     if customer_wa:
         q &= Q(customer_wa=customer_wa.strip())
 
-    seats = Seat.objects.select_for_update().filter(q).order_by("code")
+    seats = Seat.objects.select_for_update(of=("self",)).filter(q).order_by("code")
     if not seats.exists():
         return ServiceResult(False, "Claim code tidak valid atau sudah expired.")
 
@@ -305,6 +346,27 @@ def claim_hold_by_code(
 # -----------------------------
 # Admin: BOOKED + booking_code (Versi B)
 # -----------------------------
+def _lock_seats_for_booking(trip_id: int, seat_codes: list[str]) -> ServiceResult | None:
+    """
+    Lock + validasi kursi yang mau di-BOOKED dalam 1 SELECT ... FOR UPDATE.
+    Return ServiceResult gagal kalau tidak valid, None kalau aman di-update.
+    """
+    rows = list(
+        Seat.objects.select_for_update()
+        .filter(trip_id=trip_id, code__in=seat_codes)
+        .order_by("code")
+        .values_list("code", "status")
+    )
+    if len(rows) != len(seat_codes):
+        return ServiceResult(False, "Ada kursi yang tidak ditemukan.")
+
+    already_booked = [code for code, status in rows if status == Seat.Status.BOOKED]
+    if already_booked:
+        return ServiceResult(False, f"Kursi sudah BOOKED: {', '.join(already_booked)}")
+
+    return None
+
+
 @transaction.atomic
 def admin_generate_booking_code_and_book(trip_id: int, seat_codes: list[str]) -> ServiceResult:
     """
@@ -316,17 +378,13 @@ def admin_generate_booking_code_and_book(trip_id: int, seat_codes: list[str]) ->
     expire_holds()
     now = _now()
 
-    seats = Seat.objects.select_for_update().filter(trip_id=trip_id, code__in=seat_codes)
-    if seats.count() != len(seat_codes):
-        return ServiceResult(False, "Ada kursi yang tidak ditemukan.")
-
-    already_booked = list(seats.filter(status=Seat.Status.BOOKED).values_list("code", flat=True))
-    if already_booked:
-        return ServiceResult(False, f"Kursi sudah BOOKED: {', '.join(already_booked)}")
+    invalid = _lock_seats_for_booking(trip_id, seat_codes)
+    if invalid:
+        return invalid
 
     booking_code = Seat.generate_booking_code()
 
-    seats.update(
+    Seat.objects.filter(trip_id=trip_id, code__in=seat_codes).update(
         status=Seat.Status.BOOKED,
         booked_at=now,
         booking_code=booking_code,
@@ -353,15 +411,11 @@ def confirm_booked_by_admin(trip_id: int, seat_codes: list[str]) -> ServiceResul
     expire_holds()
     now = _now()
 
-    seats = Seat.objects.select_for_update().filter(trip_id=trip_id, code__in=seat_codes)
-    if seats.count() != len(seat_codes):
-        return ServiceResult(False, "Ada kursi yang tidak ditemukan.")
+    invalid = _lock_seats_for_booking(trip_id, seat_codes)
+    if invalid:
+        return invalid
 
-    already_booked = list(seats.filter(status=Seat.Status.BOOKED).values_list("code", flat=True))
-    if already_booked:
-        return ServiceResult(False, f"Kursi sudah BOOKED: {', '.join(already_booked)}")
-
-    seats.update(
+    Seat.objects.filter(trip_id=trip_id, code__in=seat_codes).update(
         status=Seat.Status.BOOKED,
         booked_at=now,
         hold_token=None,
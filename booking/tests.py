@@ -1,5 +1,6 @@
 from datetime import timedelta
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
 from django.utils import timezone
 
 from .models import Trip, Seat
@@ -128,6 +129,35 @@ class BookingServiceTests(TestCase):
         self.assertIsNone(seat.hold_token)
         self.assertIsNone(seat.hold_until)
 
+    def test_admin_generate_booking_code_and_book(self):
+        services.hold_seat(self.trip.id, "A1", self.token_a)
+
+        res = services.admin_generate_booking_code_and_book(self.trip.id, ["A1", "A2"])
+        self.assertTrue(res.ok)
+        booking_code = res.data["booking_code"]
+
+        for code in ["A1", "A2"]:
+            seat = Seat.objects.get(trip=self.trip, code=code)
+            self.assertEqual(seat.status, Seat.Status.BOOKED)
+            self.assertEqual(seat.booking_code, booking_code)
+            self.assertIsNone(seat.hold_token)
+
+        res = services.admin_generate_booking_code_and_book(self.trip.id, ["A2", "A3"])
+        self.assertFalse(res.ok)
+        self.assertIn("A2", res.message)
+        seat = Seat.objects.get(trip=self.trip, code="A3")
+        self.assertEqual(seat.status, Seat.Status.AVAILABLE)
+
+        res = services.admin_generate_booking_code_and_book(self.trip.id, ["A3", "Z9"])
+        self.assertFalse(res.ok)
+
+    def test_get_seat_map_queries(self):
+        # expire_holds + trip + prefetch seats, tanpa query tambahan per seat
+        with self.assertNumQueries(3):
+            res = services.get_seat_map(self.trip.id)
+        self.assertTrue(res.ok)
+        self.assertEqual([s["code"] for s in res.data["seats"]], ["A1", "A2", "A3", "A4"])
+
     def test_expire_holds_releases_seat(self):
         seat = Seat.objects.get(trip=self.trip, code="A1")
         seat.status = Seat.Status.HOLD
@@ -149,9 +179,22 @@ class BookingServiceTests(TestCase):
         self.assertIsNone(seat.customer_wa)
         self.assertIsNone(seat.claim_code)
 
+    def test_expire_holds_is_single_update(self):
+        Seat.objects.filter(trip=self.trip).update(
+            status=Seat.Status.HOLD,
+            hold_token=self.token_a,
+            hold_until=timezone.now() - timedelta(minutes=1),
+        )
+
+        with self.assertNumQueries(1):
+            released = services.expire_holds()
+        self.assertEqual(released, 4)
+
 
 class BookingViewsTests(TestCase):
     def setUp(self):
+        # lock debounce expire_holds di trips_list disimpan di cache -> reset per test
+        cache.clear()
         self.client = Client()
         self.trip = Trip.objects.create(
             title="Jakarta → Bandung (Pagi)",
@@ -182,3 +225,114 @@ class BookingViewsTests(TestCase):
         self.assertTrue(data["ok"])
         seat = Seat.objects.get(trip=self.trip, code="A1")
         self.assertEqual(seat.status, Seat.Status.HOLD)
+
+    def test_trips_list_endpoint(self):
+        self.trip.bus_image = "trip_bus/bus1.jpeg"
+        self.trip.save()
+
+        resp = self.client.get("/api/trips/")
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertTrue(data["ok"])
+        self.assertEqual(len(data["trips"]), 1)
+        trip = data["trips"][0]
+        self.assertEqual(trip["id"], self.trip.id)
+        self.assertEqual(trip["depart_at"], self.trip.depart_at.isoformat())
+        self.assertEqual(trip["bus_image_url"], "http://testserver/media/trip_bus/bus1.jpeg")
+
+    def test_trips_list_encodes_non_ascii_image_name(self):
+        # update() langsung: file tidak perlu ada di MEDIA_ROOT (lewati pre_save image_cropping)
+        Trip.objects.filter(pk=self.trip.pk).update(bus_image="trip_bus/bús_1.jpg")
+        self.trip.refresh_from_db()
+
+        resp = self.client.get("/api/trips/")
+        trip = resp.json()["trips"][0]
+        self.assertEqual(trip["bus_image_url"], "http://testserver/media/trip_bus/b%C3%BAs_1.jpg")
+        self.assertEqual(trip["bus_image_url"], "http://testserver" + self.trip.bus_image.url)
+
+    @override_settings(ADMIN_API_KEY="rahasia")
+    def test_admin_endpoint_requires_valid_key(self):
+        body = '{"trip_id": %d, "seat_codes": ["A1"]}' % self.trip.id
+
+        resp = self.client.post(
+            "/api/admin/generate-booking-code/",
+            data=body,
+            content_type="application/json",
+            HTTP_X_ADMIN_KEY="salah",
+        )
+        self.assertEqual(resp.status_code, 403)
+
+        resp = self.client.post(
+            "/api/admin/generate-booking-code/",
+            data=body,
+            content_type="application/json",
+            HTTP_X_ADMIN_KEY="rahasia",
+        )
+        self.assertEqual(resp.status_code, 200)
+        seat = Seat.objects.get(trip=self.trip, code="A1")
+        self.assertEqual(seat.status, Seat.Status.BOOKED)
+        self.assertTrue(seat.booking_code.startswith("BK-"))
+
+    def test_hold_endpoint_invalid_json(self):
+        resp = self.client.post(
+            "/api/seats/hold/",
+            data="{bukan json",
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(resp.json()["ok"])
+
+    def test_seat_map_endpoint(self):
+        resp = self.client.get("/api/trips/%d/seats/" % self.trip.id)
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()["data"]
+        self.assertEqual(data["trip"]["id"], self.trip.id)
+        self.assertEqual(
+            data["seats"],
+            [{"id": data["seats"][0]["id"], "code": "A1", "status": "AVAILABLE", "hold_until": None}],
+        )
+
+    @override_settings(ADMIN_API_KEY="")
+    def test_admin_endpoint_forbidden_without_configured_key(self):
+        resp = self.client.post(
+            "/api/admin/generate-booking-code/",
+            data='{"trip_id": %d, "seat_codes": ["A1"]}' % self.trip.id,
+            content_type="application/json",
+            HTTP_X_ADMIN_KEY="",
+        )
+        self.assertEqual(resp.status_code, 403)
+
+    def test_csrf_endpoint_sets_cookie(self):
+        resp = self.client.get("/csrf/")
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(resp.content, b"")
+        self.assertIn("csrftoken", resp.cookies)
+
+    def test_release_endpoint_without_session_does_not_create_one(self):
+        resp = self.client.post(
+            "/api/seats/release/",
+            data='{"trip_id": %d, "seat_code": "A1"}' % self.trip.id,
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 409)
+        self.assertNotIn("sessionid", resp.cookies)
+
+    def test_trips_list_debounces_expire_holds(self):
+        seat = Seat.objects.get(trip=self.trip, code="A1")
+        expired = timezone.now() - timedelta(minutes=1)
+        Seat.objects.filter(pk=seat.pk).update(
+            status=Seat.Status.HOLD, hold_token="tokenA", hold_until=expired
+        )
+
+        # GET pertama menjalankan sweep
+        self.client.get("/api/trips/")
+        seat.refresh_from_db()
+        self.assertEqual(seat.status, Seat.Status.AVAILABLE)
+
+        # GET kedua masih dalam interval -> tidak ada UPDATE
+        Seat.objects.filter(pk=seat.pk).update(
+            status=Seat.Status.HOLD, hold_token="tokenA", hold_until=expired
+        )
+        self.client.get("/api/trips/")
+        seat.refresh_from_db()
+        self.assertEqual(seat.status, Seat.Status.HOLD)
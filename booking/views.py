@@ -1,9 +1,15 @@
-import json
+import functools
+import hmac
 import secrets
 from typing import Any
 
+import orjson
 from django.conf import settings
-from django.http import JsonResponse, HttpRequest
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpRequest, HttpResponse
+from django.utils.encoding import filepath_to_uri
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
 
@@ -11,23 +17,42 @@ from . import services
 
 SESSION_KEY = "seat_hold_token"
 ADMIN_KEY_HEADER = "X-ADMIN-KEY"
+# nama key di request.META (WSGI) untuk ADMIN_KEY_HEADER -> "HTTP_X_ADMIN_KEY"
+ADMIN_KEY_META = "HTTP_" + ADMIN_KEY_HEADER.upper().replace("-", "_")
+
+# trips_list cukup menyapu hold expired paling sering 1x per interval ini
+EXPIRE_HOLDS_LOCK_KEY = "expire_holds_lock"
+EXPIRE_HOLDS_INTERVAL_SECONDS = 10
+
+# payload konstan -> encode sekali saat import
+_HEALTH_BYTES = orjson.dumps({"ok": True, "message": "busbooking API is running"})
 
 
 # -----------------------------
 # Helpers
 # -----------------------------
-def _ok(data: dict | None = None, message: str = "OK", status: int = 200) -> JsonResponse:
+def _json_response(payload: dict, status: int = 200) -> HttpResponse:
+    # orjson langsung menghasilkan bytes (lebih cepat dari encoder JsonResponse)
+    return HttpResponse(orjson.dumps(payload), status=status, content_type="application/json")
+
+
+def _ok(data: dict | None = None, message: str = "OK", status: int = 200) -> HttpResponse:
     payload = {"ok": True, "message": message}
     if data is not None:
         payload["data"] = data
-    return JsonResponse(payload, status=status)
+    return _json_response(payload, status=status)
 
 
-def _err(message: str, status: int = 400, data: dict | None = None) -> JsonResponse:
+def _err(message: str, status: int = 400, data: dict | None = None) -> HttpResponse:
     payload = {"ok": False, "message": message}
     if data is not None:
         payload["data"] = data
-    return JsonResponse(payload, status=status)
+    return _json_response(payload, status=status)
+
+
+def _peek_hold_token(request: HttpRequest) -> str:
+    # baca saja, tanpa membuat token/sesi baru (tidak memicu write django_session)
+    return request.session.get(SESSION_KEY) or ""
 
 
 def _get_or_create_hold_token(request: HttpRequest) -> str:
@@ -38,13 +63,14 @@ def _get_or_create_hold_token(request: HttpRequest) -> str:
     return token
 
 
-def _json_body(request: HttpRequest) -> tuple[dict[str, Any], JsonResponse | None]:
-    raw = request.body.decode("utf-8") if request.body else ""
-    if not raw.strip():
+def _json_body(request: HttpRequest) -> tuple[dict[str, Any], HttpResponse | None]:
+    raw = request.body
+    if not raw:
         return {}, None
     try:
-        return json.loads(raw), None
-    except json.JSONDecodeError:
+        # orjson menerima bytes langsung, tanpa decode("utf-8") dulu
+        return orjson.loads(raw), None
+    except orjson.JSONDecodeError:
         return {}, _err("JSON body tidak valid.", status=400)
 
 
@@ -55,6 +81,19 @@ def _to_int(value: Any, default: int = 0) -> int:
         return default
 
 
+@functools.lru_cache(maxsize=1)
+def _expected_admin_key() -> bytes:
+    # settings tidak berubah selama proses berjalan -> cukup encode sekali
+    return (getattr(settings, "ADMIN_API_KEY", "") or "").encode("utf-8")
+
+
+@receiver(setting_changed)
+def _reset_expected_admin_key(*, setting, **kwargs):
+    # override_settings (test) mengganti ADMIN_API_KEY -> buang cache lama
+    if setting == "ADMIN_API_KEY":
+        _expected_admin_key.cache_clear()
+
+
 def _is_admin_request(request: HttpRequest) -> bool:
     # 1) admin/staff session login
     user = getattr(request, "user", None)
@@ -62,12 +101,14 @@ def _is_admin_request(request: HttpRequest) -> bool:
         return True
 
     # 2) API key header
-    expected = getattr(settings, "ADMIN_API_KEY", "") or ""
+    expected = _expected_admin_key()
     if not expected:
         return False
 
-    provided = (request.headers.get(ADMIN_KEY_HEADER) or "").strip()
-    return provided == expected
+    # baca META langsung, tanpa membangun request.headers (HttpHeaders)
+    provided = request.META.get(ADMIN_KEY_META, "").strip()
+    # compare_digest: waktu konstan, tidak bocorkan prefix key lewat timing
+    return hmac.compare_digest(provided.encode("utf-8"), expected)
 
 
 # -----------------------------
@@ -76,29 +117,25 @@ def _is_admin_request(request: HttpRequest) -> bool:
 @ensure_csrf_cookie
 @require_http_methods(["GET"])
 def health(request: HttpRequest):
-    return _ok(message="busbooking API is running")
+    return HttpResponse(_HEALTH_BYTES, content_type="application/json")
 
 
 @require_http_methods(["GET"])
 def trips_list(request: HttpRequest):
-    services.expire_holds()
-    trips = services.list_trips()
-
-    data = [
-        {
-            "id": t.id,
-            "title": t.title,
-            "bus_type": t.bus_type,
-            "route_from": t.route_from,
-            "route_to": t.route_to,
-            "depart_at": t.depart_at.isoformat(),
-            "price": t.price,
-            "capacity_total": t.capacity_total,
-            "bus_image_url": request.build_absolute_uri(t.bus_image.url) if getattr(t, "bus_image", None) else "",
-        }
-        for t in trips
-    ]
-    return JsonResponse({"ok": True, "trips": data}, status=200)
+    # cache.add atomic: hanya 1 request per interval yang menjalankan UPDATE
+    if cache.add(EXPIRE_HOLDS_LOCK_KEY, 1, timeout=EXPIRE_HOLDS_INTERVAL_SECONDS):
+        services.expire_holds()
+    # prefix media dihitung sekali, bukan build_absolute_uri per trip
+    media_prefix = request.build_absolute_uri(settings.MEDIA_URL)
+
+    # dict hasil values() langsung dipakai; cukup sesuaikan depart_at & bus_image
+    trips = list(services.list_trips())
+    for t in trips:
+        t["depart_at"] = t["depart_at"].isoformat()
+        bus_image = t.pop("bus_image")
+        # filepath_to_uri: percent-encode seperti Storage.url() (nama file non-ASCII)
+        t["bus_image_url"] = media_prefix + filepath_to_uri(bus_image) if bus_image else ""
+    return _json_response({"ok": True, "trips": trips})
 
 
 
@@ -142,7 +179,8 @@ def release_seat(request: HttpRequest):
     if not trip_id or not seat_code:
         return _err("trip_id dan seat_code wajib diisi.", status=400)
 
-    hold_token = _get_or_create_hold_token(request)
+    # user tanpa token pasti tidak punya hold -> jangan buat sesi baru
+    hold_token = _peek_hold_token(request)
     res = services.release_seat(trip_id=trip_id, seat_code=seat_code, hold_token=hold_token)
 
     if not res.ok:
@@ -231,7 +269,7 @@ def admin_generate_booking_code(request: HttpRequest):
     if not trip_id or not isinstance(seat_codes, list) or not seat_codes:
         return _err("trip_id dan seat_codes(list) wajib diisi.", status=400)
 
-    seat_codes_clean = [str(c).strip().upper() for c in seat_codes if str(c).strip()]
+    seat_codes_clean = [s for s in (str(c).strip().upper() for c in seat_codes) if s]
     if not seat_codes_clean:
         return _err("seat_codes tidak boleh kosong.", status=400)
 
@@ -263,7 +301,7 @@ def admin_confirm_booked(request: HttpRequest):
     if not trip_id or not isinstance(seat_codes, list) or not seat_codes:
         return _err("trip_id dan seat_codes(list) wajib diisi.", status=400)
 
-    seat_codes_clean = [str(c).strip().upper() for c in seat_codes if str(c).strip()]
+    seat_codes_clean = [s for s in (str(c).strip().upper() for c in seat_codes) if s]
     if not seat_codes_clean:
         return _err("seat_codes tidak boleh kosong.", status=400)
 
@@ -280,10 +318,9 @@ def expire_now(request: HttpRequest):
     released = services.expire_holds()
     return _ok(data={"released": released}, message="Expired holds released")
 
-from django.views.decorators.csrf import ensure_csrf_cookie
-from django.views.decorators.http import require_http_methods
 
 @ensure_csrf_cookie
 @require_http_methods(["GET"])
 def csrf(request: HttpRequest):
-    return _ok(message="CSRF cookie set")
+    # cukup set cookie csrftoken, body tidak dipakai client
+    return HttpResponse(status=204)